@@ -1,12 +1,26 @@
 import asyncio
-from typing import Dict, List, Any, Optional, Callable, NotRequired, TypedDict
-from pydantic import BaseModel, Field
+import copy
+import dataclasses
+import keyword
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Dict, List, Any, Optional, Callable, NamedTuple, NotRequired, Tuple, Type, TypedDict
 
 # WHY: We use a flexible Dictionary for State so that any node can add any data it wants.
 # Ideally this would be a Pydantic model for stricter validation, but a dict is easier for a generic engine.
+# When the shape of the state is known, a graph can use a typed '@dataclass(slots=True)' instead
+# (see 'Graph.state_cls'): attribute access is faster than dict lookups in tight loops.
 State = Dict[str, Any]
 
-class Edge(BaseModel):
+COND_CACHE_SIZE = 1024 # Max cached condition results per graph
+TOOL_CACHE_SIZE = 256 # Max cached results of 'pure' tools per graph (least recently used are dropped)
+MAX_STEPS = 100 # WHY: Safety brake to prevent infinite loops from freezing the server.
+
+# WHY: Nodes and Edges are plain frozen dataclasses with slots (not Pydantic models).
+# They are read on every routing step, and slot attributes are fast to read.
+# Input validation happens at the API boundary instead (NodeModel/EdgeModel in main.py).
+@dataclasses.dataclass(slots=True, frozen=True)
+class Edge:
     """
     Represents a connection between two nodes. 
     It tells the engine: "After checking 'source_node', where do I go next?"
@@ -16,8 +30,13 @@ class Edge(BaseModel):
     # WHY: Conditions allow for "Branching". e.g., "Only go to 'Refine' IF 'score < 5'"
     condition: Optional[Callable[[State], bool]] = None
     condition_name: Optional[str] = None # For serialization/API purposes
+    # WHY: Naming the state keys the condition looks at lets the engine cache its result.
+    # If those keys did not change, the answer cannot have changed either.
+    # (Declarative conditions like 'IntThreshold' already know their keys.)
+    condition_reads: Tuple[str, ...] = ()
 
-class Node(BaseModel):
+@dataclasses.dataclass(slots=True, frozen=True)
+class Node:
     """
     A single step in our workflow. 
     It points to a tool (function) name in the registry that does the actual work.
@@ -25,23 +44,321 @@ class Node(BaseModel):
     name: str
     tool_name: str # Name of the function in the registry
 
+class LogRecord(NamedTuple):
+    """
+    One entry of the execution log.
+    WHY: A tuple is much cheaper to build than a dict on every step.
+    Turning it into JSON is left to the API layer.
+    """
+    step: int # Also the state "version" after this step
+    node: str
+    updates: Any = None
+    state_snapshot: Optional[State] = None # Only filled in debug mode
+    error: Optional[str] = None
+
+def state_get(state: Any, key: str, default: Any = None) -> Any:
+    """Reads a key from either a dict state or a typed (dataclass) state."""
+    if isinstance(state, dict):
+        return state.get(key, default)
+    return getattr(state, key, default)
+
+def _state_to_dict(state: Any, snapshot: bool = False) -> State:
+    """
+    Plain dict copy of the state, used for the final result and (with 'snapshot') for debug snapshots.
+    WHY: The "log" is appended to in place, so a snapshot needs its own copy of it
+    to show the log as it was at that step.
+    """
+    if isinstance(state, dict):
+        data = state.copy()
+    else:
+        data = {f.name: getattr(state, f.name) for f in dataclasses.fields(state)}
+    if snapshot and isinstance(data.get("log"), list):
+        data["log"] = list(data["log"])
+    return data
+
+@dataclasses.dataclass(slots=True, frozen=True)
+class IntThreshold:
+    """
+    A declarative condition: "state[key] > gt" (missing keys count as 0).
+    e.g. IntThreshold(key="issue_count", gt=0) means "there are issues".
+
+    WHY: Unlike a lambda, the engine knows exactly what this reads, so it can:
+    - cache its result per value of 'key' (see 'Graph._check_condition')
+    - generate a specialised function for it at compile time (see 'compile')
+    - safely accept it by name from the API (see 'ToolRegistry.register_condition')
+    """
+    key: str
+    gt: int = 0
+
+    def __post_init__(self):
+        # WHY: 'compile' writes 'gt' into generated source, so it must be a plain int literal
+        if not isinstance(self.gt, int):
+            raise ValueError(f"IntThreshold 'gt' must be an int, got {self.gt!r}")
+
+    @property
+    def reads(self) -> Tuple[str, ...]:
+        return (self.key,)
+
+    def __call__(self, state: Any) -> bool:
+        return state_get(state, self.key, 0) > self.gt
+
+    def compile(self, state_cls: Optional[Type] = None) -> Callable[[Any], bool]:
+        """
+        Generates the Python source for this exact check and compiles it into a function.
+        Typed (slots dataclass) states read the attribute directly when 'key' is one of its fields;
+        any other key (and any dict state) falls back to a lookup with 0 as the default.
+        """
+        if state_cls is None:
+            read = f"s.get({self.key!r}, 0)"
+        elif (self.key.isidentifier() and not keyword.iskeyword(self.key)
+              and self.key in {f.name for f in dataclasses.fields(state_cls)}):
+            read = f"s.{self.key}"
+        else:
+            # WHY: Not a field, so 's.<key>' would raise AttributeError (or not even parse).
+            read = f"getattr(s, {self.key!r}, 0)"
+        source = f"lambda s: {read} > {self.gt!r}"
+        return eval(compile(source, f"<condition {self.key!r} > {self.gt}>", "eval"), {})
+
 class Graph:
     """
     The orchestrator. It manages the flow of execution from one node to another.
     """
-    def __init__(self, name: str, start_node: str):
+    def __init__(self, name: str, start_node: str, batch_size: int = 8, state_cls: Optional[Type] = None,
+                 executor: Optional[Executor] = None):
         self.name = name
         self.nodes: Dict[str, Node] = {}
         self.edges: List[Edge] = []
+        # WHY: Routing only needs the edges leaving the current node, so we index them
+        # by source once instead of scanning every edge on every step.
+        self._outgoing: Dict[str, List[Edge]] = {}
         self.start_node = start_node
+        # WHY: Caps how many nodes of one wave run at the same time, so a wide graph
+        # cannot open hundreds of LLM/HTTP calls at once.
+        self.batch_size = batch_size
+        # Optional dataclass for the state. Tools then get an instance of it instead of a dict
+        # (and still return a dict of updates). The final state is always returned as a dict.
+        # Initial state keys that are not fields of the dataclass are ignored.
+        # Tools that should work with both kinds of state read it through 'state_get'.
+        self.state_cls = state_cls
+        # WHY: Sync tools run directly on the event loop, so a CPU-heavy tool (AST parsing, metrics)
+        # would freeze the whole server. Tools marked with 'tool.cpu_bound = True' run in this
+        # executor instead (e.g. a ProcessPoolExecutor, to use all cores despite the GIL).
+        # Such tools get a copy of the state, so they must return their changes as updates.
+        self.executor = executor
+        self._schedule: Optional[List[List[str]]] = None
+        # Built by 'compile': source node -> [(target node, condition function or None, state keys it reads)]
+        self._routes: Dict[str, List[Tuple[str, Optional[Callable], Tuple[str, ...]]]] = {}
+        self._reachable: List[str] = [] # Nodes reachable from 'start_node', in DFS order (built by 'compile')
+        self._compiled = False
+        # (condition function, values of the keys it reads) -> result of the condition
+        self._cond_cache: Dict[Tuple[Callable, Tuple], bool] = {}
+        self._cond_cache_enabled = True
+        # Filled in by 'bind': node name -> (tool function, is it async?, run it in the executor?,
+        #                                    state keys it is a pure function of)
+        self._tools: Dict[str, Tuple[Callable, bool, bool, Tuple[str, ...]]] = {}
+        # (tool function, values of the keys it reads) -> the updates it returned
+        self._tool_cache: "OrderedDict[Tuple[Callable, Tuple], Dict[str, Any]]" = OrderedDict()
+        self._bound_to: Optional[Tuple[Any, int]] = None # (registry, registry version) of the last 'bind'
 
     def add_node(self, node: Node):
         self.nodes[node.name] = node
+        self._compiled = False # Structure changed, the cached schedule is stale
+        self._bound_to = None
 
     def add_edge(self, edge: Edge):
         self.edges.append(edge)
+        self._outgoing.setdefault(edge.source_node, []).append(edge)
+        self._compiled = False
+        self._bound_to = None # May have made more nodes reachable
+
+    def bind(self, tool_registry):
+        """
+        Resolves the tool of every node once.
+        WHY: The node -> tool_name mapping does not change after the graph is built,
+        so there is no need to ask the registry (and inspect the function) on every step.
+        Nodes that can never be reached from 'start_node' are skipped (see 'compile').
+        """
+        self.compile()
+        tools = {}
+        for node_name in self._reachable:
+            node = self.nodes[node_name]
+            tool_func = tool_registry.get_tool(node.tool_name)
+            is_coro = asyncio.iscoroutinefunction(tool_func)
+            offload = not is_coro and getattr(tool_func, "cpu_bound", False)
+            reads = getattr(tool_func, "pure_reads", ()) # Set by the '@pure' decorator
+            tools[node.name] = (tool_func, is_coro, offload, reads)
+        self._tools = tools
+        self._bound_to = (tool_registry, tool_registry.version)
 
-    async def run(self, initial_state: State, tool_registry) -> Dict[str, Any]:
+    def disable_condition_cache(self):
+        """
+        Always re-evaluate conditions.
+        Needed when a condition depends on something outside the keys it declares (e.g. time or randomness).
+        """
+        self._cond_cache_enabled = False
+        self._cond_cache.clear()
+
+    def compile(self) -> Optional[List[List[str]]]:
+        """
+        Pre-computes the execution plan ("schedule") of the graph and caches it.
+
+        HOW IT WORKS:
+        If no edge has a condition, the route is fully known before running, so we
+        sort the nodes into "waves" with Kahn's algorithm: every node in a wave only
+        depends on nodes of earlier waves, so the nodes inside one wave can run concurrently.
+
+        Returns None when the graph has conditional edges: they decide the route
+        at runtime, so it is executed step by step instead.
+
+        Raises ValueError if the graph has a cycle made only of unconditional edges
+        (see '_check_cycles'), so a broken graph is rejected once, up front.
+        Graphs run step by step also may not fan out: each node gets at most one
+        unconditional ("default") edge (see '_check_single_default').
+
+        Also prepares the routing table used by '_get_next_node', turning declarative
+        conditions (like 'IntThreshold') into generated functions.
+
+        All passes work on the nodes reachable from 'start_node' (one '_dfs_order'
+        traversal): unreachable ("dead") nodes are pruned, and edges pointing to
+        nodes that don't exist (or a graph without nodes) raise ValueError.
+        """
+        if self._compiled:
+            return self._schedule
+
+        if not self.nodes:
+            raise ValueError("Graph needs at least one node.")
+        reachable = self._dfs_order(self.start_node)
+        for node_name in reachable:
+            if node_name not in self.nodes:
+                raise ValueError(f"Node '{node_name}' not found in graph.")
+        self._check_cycles(reachable)
+        self._reachable = reachable
+        self._routes = self._compile_routes()
+        self._cond_cache.clear() # Keys refer to the previous condition functions
+        self._schedule = None
+        if not any(edge.condition for edge in self.edges):
+            self._schedule = self._level_order()
+        else:
+            self._check_single_default()
+        self._compiled = True
+        return self._schedule
+
+    def _compile_routes(self) -> Dict[str, List[Tuple[str, Optional[Callable], Tuple[str, ...]]]]:
+        """
+        Materializes each edge's condition once.
+        Conditions with a 'compile' method are code-generated for this graph's kind of state;
+        any other callable (e.g. a lambda) is used as it is.
+        """
+        routes = {}
+        for source in self._reachable:
+            route = []
+            for edge in self._outgoing.get(source, ()):
+                predicate = edge.condition
+                if predicate is not None and hasattr(predicate, "compile"):
+                    predicate = predicate.compile(self.state_cls)
+                reads = edge.condition_reads or getattr(edge.condition, "reads", ())
+                route.append((edge.target_node, predicate, reads))
+            routes[source] = route
+        return routes
+
+    def _dfs_order(self, start: str, seen: Optional[set] = None,
+                   follow: Optional[Callable[[Edge], bool]] = None,
+                   on_back_edge: Optional[Callable[[Edge], None]] = None) -> List[str]:
+        """
+        Depth-first traversal from 'start'. Returns the newly visited nodes in visiting order.
+        This is the shared building block of the compile passes:
+        - seen: pass the same set to continue one traversal from several roots
+        - follow: only walk the edges for which follow(edge) is True
+        - on_back_edge: called for an edge leading back to a node on the current path (a cycle)
+
+        WHY: An explicit stack of (node, iterator over its edges) instead of recursion:
+        Python function calls are slow and recursion is capped at ~1000 levels.
+        """
+        if seen is None:
+            seen = set()
+        if start in seen:
+            return []
+        seen.add(start)
+        order = [start]
+        on_path = {start}
+        stack = [(start, iter(self._outgoing.get(start, ())))]
+        while stack:
+            node_name, edges = stack[-1]
+            edge = next(edges, None)
+            if edge is None:
+                stack.pop()
+                on_path.discard(node_name)
+                continue
+            if follow is not None and not follow(edge):
+                continue
+
+            target = edge.target_node
+            if target in on_path:
+                if on_back_edge is not None:
+                    on_back_edge(edge)
+            elif target not in seen:
+                seen.add(target)
+                order.append(target)
+                on_path.add(target)
+                stack.append((target, iter(self._outgoing.get(target, ()))))
+        return order
+
+    def _check_cycles(self, roots: List[str]):
+        """
+        Rejects loops that can never end.
+        WHY: A loop made of unconditional edges would spin until MAX_STEPS, wasting
+        100 tool calls on every run. Loops (like suggest -> check -> detect -> suggest in
+        the code review) must go through a conditional edge, which is their way out.
+
+        HOW: Depth-first search over the unconditional edges only, starting from every
+        root. Reaching a node that is still on the current path means we walked in a circle.
+        """
+        def reject(edge: Edge):
+            raise ValueError(f"Graph has non-conditional cycle through node '{edge.target_node}'.")
+
+        seen: set = set()
+        for root in roots:
+            # Conditional edges are branch-guarded, they can end a loop
+            self._dfs_order(root, seen, follow=lambda edge: not edge.condition, on_back_edge=reject)
+
+    def _check_single_default(self):
+        """
+        Rejects nodes with more than one unconditional outgoing edge in a step-by-step graph.
+        WHY: Step by step, '_get_next_node' follows only the first matching edge, so the other
+        unconditional successors would silently never run (only waves run all of them).
+        """
+        for source in self._reachable:
+            defaults = [target for target, condition, _ in self._routes[source] if condition is None]
+            if len(defaults) > 1:
+                raise ValueError(
+                    f"Node '{source}' has more than one unconditional edge ({', '.join(defaults)}); "
+                    "graphs with conditional edges run step by step and can only follow one.")
+
+    def _level_order(self) -> List[List[str]]:
+        """Kahn's algorithm over the nodes reachable from 'start_node', grouped by level."""
+        # Only nodes reachable from the start node are part of the run
+        reachable = self._reachable
+        indegree = {node_name: 0 for node_name in reachable}
+        for node_name in reachable:
+            for edge in self._outgoing.get(node_name, ()):
+                indegree[edge.target_node] += 1
+
+        schedule = []
+        wave = [node_name for node_name in reachable if indegree[node_name] == 0]
+        while wave:
+            schedule.append(wave)
+            next_wave = []
+            for node_name in wave:
+                for edge in self._outgoing.get(node_name, ()):
+                    indegree[edge.target_node] -= 1
+                    if indegree[edge.target_node] == 0:
+                        next_wave.append(edge.target_node)
+            wave = next_wave
+
+        # No leftovers possible: '_check_cycles' already rejected cyclic graphs
+        return schedule
+
+    async def run(self, initial_state: State, tool_registry, debug: bool = False) -> Dict[str, Any]:
         """
         The main loop that executes the workflow.
         
@@ -53,43 +370,50 @@ class Graph:
            - If a conditional edge evaluates to True, take it.
            - Otherwise take the unconditional edge.
         5. Repeat until no edges match (End of graph).
+
+        If the graph could be compiled into waves (see 'compile'), each wave is
+        executed concurrently instead of walking one node at a time.
+        MAX_STEPS then does not apply: a compiled graph is known to be acyclic.
+
+        Logs are 'LogRecord's that only keep the 'updates' of each step; the step number is the state 'version'.
+        Any historical state can be rebuilt by replaying the updates from step 0.
+        This only holds for tools that return their changes: edits made to the state in place
+        are not logged (all shipped tools return their changes).
+        WHY: Copying the whole state (including large 'code' blobs) on every step is
+        expensive, so full 'state_snapshot's are only recorded when 'debug' is True.
         """
+        state = self._make_state(initial_state)
+
+        schedule = self.compile()
+
+        # Re-bind only if the registry (or a tool inside it) changed since the last run
+        if self._bound_to != (tool_registry, tool_registry.version):
+            self.bind(tool_registry)
+
+        if schedule is not None:
+            return await self._run_waves(schedule, state, debug)
+
         current_node_name = self.start_node
-        state = initial_state.copy()
-        logs = []
+        logs: List[Optional[LogRecord]] = [None] * MAX_STEPS # Pre-allocated, trimmed at the end
         steps = 0
-        MAX_STEPS = 100 # WHY: Safety brake to prevent infinite loops from freezing the server.
 
         while current_node_name and steps < MAX_STEPS:
             if current_node_name not in self.nodes:
                 raise ValueError(f"Node '{current_node_name}' not found in graph.")
 
-            node = self.nodes[current_node_name]
-            
             # Execute Node
             try:
-                # WHY: We look up the function code using the string name from the registry
-                tool_func = tool_registry.get_tool(node.tool_name)
-                
                 # We assume tools take 'state' as argument and return a dict of updates
-                updates = await self._execute_tool(tool_func, state)
+                # (or change 'state' in place and return an empty dict / None)
+                updates = await self._execute_tool(current_node_name, state)
                 
                 # Update state
-                if isinstance(updates, dict):
-                    state.update(updates)
+                self._apply_updates(state, updates)
                 
-                logs.append({
-                    "step": steps,
-                    "node": current_node_name,
-                    "updates": updates,
-                    "state_snapshot": state.copy() # Snapshot for debugging
-                })
+                # Snapshot only for debugging
+                logs[steps] = LogRecord(steps, current_node_name, updates, _state_to_dict(state, snapshot=True) if debug else None)
             except Exception as e:
-                logs.append({
-                    "step": steps,
-                    "node": current_node_name,
-                    "error": str(e)
-                })
+                logs[steps] = LogRecord(steps, current_node_name, error=str(e))
                 raise e
 
             steps += 1
@@ -97,31 +421,159 @@ class Graph:
             # Determine next node
             current_node_name = self._get_next_node(current_node_name, state)
 
-        return {"final_state": state, "logs": logs}
+        return {"final_state": _state_to_dict(state), "logs": logs[:steps]}
+
+    async def _run_waves(self, schedule: List[List[str]], state: State, debug: bool) -> Dict[str, Any]:
+        """
+        Executes a compiled schedule wave by wave.
+        WHY: Tools are mostly I/O bound (LLM calls, HTTP), so running the independent nodes
+        of a wave together makes the run take as long as the depth of the graph, not its size.
+        """
+        logs: List[Optional[LogRecord]] = [None] * sum(len(wave) for wave in schedule)
+        steps = 0
+        semaphore = asyncio.Semaphore(self.batch_size)
+
+        async def run_node(node_name: str) -> Any:
+            async with semaphore:
+                return await self._execute_tool(node_name, state)
+
+        for wave in schedule:
+            results = await asyncio.gather(*[run_node(n) for n in wave], return_exceptions=True)
+
+            # Merge in wave order so the final state does not depend on which tool finished first
+            for node_name, updates in zip(wave, results):
+                if isinstance(updates, Exception):
+                    logs[steps] = LogRecord(steps, node_name, error=str(updates))
+                    raise updates
 
-    async def _execute_tool(self, func: Callable, state: State) -> Any:
-        """Helper to run both sync and async functions seamlessly."""
-        if asyncio.iscoroutinefunction(func):
-            return await func(state)
+                self._apply_updates(state, updates)
+
+                logs[steps] = LogRecord(steps, node_name, updates, _state_to_dict(state, snapshot=True) if debug else None)
+                steps += 1
+
+        return {"final_state": _state_to_dict(state), "logs": logs}
+
+    def _make_state(self, initial_state: State) -> Any:
+        """Builds the working state of a run from the caller's initial state (which is never modified)."""
+        if self.state_cls is None:
+            state = initial_state.copy()
         else:
-            return func(state)
+            # WHY: Callers (e.g. the API) may send extra keys; a slots dataclass has nowhere to store them
+            fields = {f.name for f in dataclasses.fields(self.state_cls)}
+            try:
+                state = self.state_cls(**{k: v for k, v in initial_state.items() if k in fields})
+            except TypeError as e:
+                raise ValueError(f"Invalid initial state for '{self.state_cls.__name__}': {e}")
+
+        # The log is appended to in place (see '_apply_updates'), so it must not be the caller's list
+        log = state_get(state, "log")
+        if log is not None:
+            if isinstance(state, dict):
+                state["log"] = list(log)
+            else:
+                state.log = list(log)
+        return state
+
+    def _apply_updates(self, state: Any, updates: Any):
+        """
+        Merges the dict returned by a tool into the state.
+        Tools may also change the state in place and return {} or None: nothing to merge then.
+        Careful, in-place changes:
+        - don't show up in the log's 'updates', so the log can no longer rebuild the state
+        - are unsafe in compiled graphs, where the nodes of a wave share one state concurrently
+        - are lost for 'cpu_bound' tools, which work on a copy in another process (rejected, see '_call_tool')
+        WHY: Tools return {"log_append": "..."} instead of copying the whole log list
+        with one more line; the engine appends that line to the "log" in place.
+        """
+        if not isinstance(updates, dict):
+            return
+        if isinstance(state, dict):
+            state.update(updates)
+            if "log_append" in updates:
+                state.setdefault("log", []).append(state.pop("log_append"))
+            return
+
+        for key, value in updates.items():
+            if key == "log_append":
+                state.log.append(value)
+            else:
+                setattr(state, key, value) # Slots: unknown keys raise AttributeError
+
+    async def _execute_tool(self, node_name: str, state: State) -> Any:
+        """
+        Helper to run both sync and async tools seamlessly (resolved in 'bind').
+        Results of '@pure' tools are cached by the values of the keys they read,
+        so they only run again when their input changed.
+        """
+        tool_func, is_coro, offload, reads = self._tools[node_name]
+        if not reads:
+            return await self._call_tool(tool_func, is_coro, offload, state)
+
+        key = (tool_func, tuple(state_get(state, k) for k in reads))
+        try:
+            cached = self._tool_cache.get(key)
+        except TypeError:
+            # Unhashable values (lists, dicts) cannot be cached, just run the tool
+            return await self._call_tool(tool_func, is_coro, offload, state)
+
+        if cached is not None:
+            self._tool_cache.move_to_end(key)
+            # WHY: A deep copy, so later in-place edits (e.g. state.issues.append) of this run
+            # can't leak into the cache and from there into every later run
+            return copy.deepcopy(cached)
+
+        updates = await self._call_tool(tool_func, is_coro, offload, state)
+        if isinstance(updates, dict):
+            self._tool_cache[key] = copy.deepcopy(updates)
+            if len(self._tool_cache) > TOOL_CACHE_SIZE:
+                self._tool_cache.popitem(last=False)
+        return updates
+
+    async def _call_tool(self, tool_func: Callable, is_coro: bool, offload: bool, state: State) -> Any:
+        if is_coro:
+            return await tool_func(state)
+        elif offload and self.executor is not None:
+            updates = await asyncio.get_running_loop().run_in_executor(self.executor, tool_func, state)
+            if not isinstance(updates, dict):
+                # Whatever it changed in place happened to a copy in the worker process
+                raise ValueError(f"cpu_bound tool '{tool_func.__name__}' must return its changes as a dict of updates.")
+            return updates
+        else:
+            return tool_func(state)
 
     def _get_next_node(self, current_node: str, state: State) -> Optional[str]:
         """
         Logic to decide where to go next.
         It evaluates conditions on edges starting from the current node.
         """
-        # Find all edges starting from current_node
-        possible_edges = [e for e in self.edges if e.source_node == current_node]
-        
-        for edge in possible_edges:
-            if edge.condition:
+        # Only the edges starting from current_node (pre-indexed in 'compile')
+        for target_node, condition, reads in self._routes.get(current_node, ()):
+            if condition:
                 # WHY: Dynamic routing based on the data in 'state'
-                if edge.condition(state):
-                    return edge.target_node
+                if self._check_condition(condition, reads, state):
+                    return target_node
             else:
                 # Unconditional edge (Default path)
-                return edge.target_node
+                return target_node
         
         # If no edge found, we are at a terminal node (End of logic)
         return None
+
+    def _check_condition(self, condition: Callable, reads: Tuple[str, ...], state: State) -> bool:
+        """Evaluates an edge condition, re-using the previous result if the keys it reads are unchanged."""
+        if not (self._cond_cache_enabled and reads):
+            return condition(state)
+
+        try:
+            key = (condition, tuple(state_get(state, k) for k in reads))
+            result = self._cond_cache.get(key)
+        except TypeError:
+            # Unhashable values (lists, dicts) cannot be cached, just evaluate
+            return condition(state)
+
+        if result is None:
+            result = bool(condition(state))
+            if len(self._cond_cache) >= COND_CACHE_SIZE:
+                self._cond_cache.clear() # WHY: Keep memory bounded when the read values keep changing
+            self._cond_cache[key] = result
+        return result
@@ -0,0 +1,24 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+class RunLimiter:
+    """
+    Caps how many workflow runs execute at the same time.
+
+    WHY THIS IS NEEDED:
+    '/graph/run' returns right away and the run continues in the background. Without a cap,
+    a burst of requests would start that many runs at once (each opening LLM/HTTP calls)
+    and exhaust the server. Runs over the limit simply wait for a free slot.
+
+    Note: this only limits concurrency, it does not batch or share work between runs.
+    Runs of the same graph already share its warm caches (compiled schedule, bound tools,
+    condition and tool results).
+    """
+    def __init__(self, runner: Callable[..., Awaitable[Any]], max_concurrency: int = 64):
+        self._runner = runner # The coroutine function that executes one run
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(self, *args) -> Any:
+        """Executes one run (the arguments for 'runner') once a slot is free."""
+        async with self._semaphore:
+            return await self._runner(*args)
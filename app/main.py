@@ -1,21 +1,49 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Response
 from pydantic import BaseModel
 from typing import Dict, Any, List, Optional
+from dataclasses import dataclass
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import os
+import sys
 import uuid
-from app.engine import Graph, Node, Edge, State
+from cachetools import TTLCache
+from app.engine import Graph, Node, Edge, State, LogRecord
 from app.registry import registry
-from app.workflows.code_review import create_code_review_graph
+from app.limiter import RunLimiter
+from app.workflows.code_review import create_code_review_graph, create_code_review_graph_fused
 
-app = FastAPI(title="Agent Workflow Engine")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Stop the worker processes of 'cpu_bound' tools
+    tool_executor.shutdown()
+
+app = FastAPI(title="Agent Workflow Engine", lifespan=lifespan)
 
 # In-memory storage
 # WHY: For this assignment, we use RAM. In production, this would be a Postgres/Redis database.
+# Graphs are read-mostly: only added by /graph/create and never changed afterwards.
 graphs: Dict[str, Graph] = {}
-runs: Dict[str, Dict[str, Any]] = {}
+# WHY: Runs are kept for an hour (max 10k) so memory doesn't grow forever under load.
+# The lock stops a /graph/state read from seeing a half-written run record.
+RUNS_MAX = 10_000
+RUNS_TTL_SECONDS = 3600
+runs: TTLCache = TTLCache(maxsize=RUNS_MAX, ttl=RUNS_TTL_SECONDS)
+runs_lock = asyncio.Lock()
+
+# WHY: Tools marked 'cpu_bound' run in worker processes so they don't block the event loop.
+# Processes are only started once such a tool is actually used.
+tool_executor = ProcessPoolExecutor(max_workers=os.cpu_count())
 
 # Pre-load the example workflow
 example_graph = create_code_review_graph()
+example_graph.executor = tool_executor
 graphs["code-review-agent"] = example_graph
+fused_graph = create_code_review_graph_fused()
+fused_graph.executor = tool_executor
+graphs["code-review-agent-fused"] = fused_graph
 
 # --- Models ---
 
@@ -28,6 +56,23 @@ class EdgeModel(BaseModel):
     target_node: str
     condition_name: Optional[str] = None
 
+@dataclass(slots=True)
+class LogEntry:
+    """
+    JSON shape of one log entry.
+    WHY: The engine logs plain tuples (cheap), we only give them field names when sending the response.
+    """
+    step: int
+    node: str
+    version: int
+    updates: Any = None
+    state_snapshot: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def from_record(cls, record: LogRecord) -> "LogEntry":
+        return cls(record.step, record.node, record.step, record.updates, record.state_snapshot, record.error)
+
 class CreateGraphRequest(BaseModel):
     name: str
     nodes: List[NodeModel]
@@ -36,6 +81,19 @@ class CreateGraphRequest(BaseModel):
 class RunGraphRequest(BaseModel):
     graph_id: str
     initial_state: Dict[str, Any]
+    debug: bool = False # Include a full state snapshot in every log entry
+
+# WHY: With a response model, FastAPI validates and serializes the response to JSON in one step
+# (in pydantic's compiled core) instead of first converting it to plain Python objects.
+class RunStartedResponse(BaseModel):
+    run_id: str
+    status: str
+
+class RunStateResponse(BaseModel):
+    status: str # "running", "completed" or "failed"
+    state: Dict[str, Any]
+    logs: List[LogEntry]
+    error: Optional[str] = None
 
 # --- API Endpoints ---
 
@@ -45,26 +103,57 @@ def create_graph(request: CreateGraphRequest):
     Registers a new graph definition dynamically via API.
     """
     graph_id = str(uuid.uuid4())
-    graph = Graph(name=request.name, start_node=request.nodes[0].name if request.nodes else "")
+    graph = Graph(name=request.name, start_node=request.nodes[0].name if request.nodes else "", executor=tool_executor)
     
     for n in request.nodes:
         graph.add_node(Node(name=n.name, tool_name=n.tool_name))
     
     for e in request.edges:
-        # Note: Dynamic condition loading is unsafe/complex for a simple demo.
-        # We will support basic named conditions if needed, otherwise conditional edges 
-        # via API might be limited to "Pre-defined" conditions in this simple version.
-        # For now, we'll just add unconditional edges for API created graphs.
-        graph.add_edge(Edge(source_node=e.source_node, target_node=e.target_node))
+        # Note: Loading condition code sent by a client would be unsafe.
+        # Conditional edges instead refer to a "Pre-defined" condition by name (see /tools).
+        condition = None
+        if e.condition_name:
+            try:
+                condition = registry.get_condition(e.condition_name)
+            except ValueError as err:
+                raise HTTPException(status_code=400, detail=str(err))
+        graph.add_edge(Edge(source_node=e.source_node, target_node=e.target_node,
+                            condition=condition, condition_name=e.condition_name))
+
+    # WHY: Validate the structure now (e.g. infinite loops) instead of failing on every run
+    try:
+        graph.compile()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
         
     graphs[graph_id] = graph
     return {"graph_id": graph_id, "message": "Graph created successfully"}
 
-@app.post("/graph/run")
-async def run_graph(request: RunGraphRequest, background_tasks: BackgroundTasks):
+async def _execute_run(run_id: str, graph: Graph, initial_state: Dict[str, Any], debug: bool):
+    """
+    Runs the engine in the background and stores the outcome under 'run_id'.
+    Records are replaced as a whole (not edited in place) since the cache may evict them at any time.
+    """
+    try:
+        result = await graph.run(initial_state, registry, debug=debug)
+    except Exception as e:
+        async with runs_lock:
+            runs[run_id] = {"status": "failed", "state": initial_state, "logs": [], "error": str(e)}
+        return
+
+    logs = [LogEntry.from_record(record) for record in result["logs"]]
+    async with runs_lock:
+        runs[run_id] = {"status": "completed", "state": result["final_state"], "logs": logs}
+
+# WHY: Caps how many runs execute at once (see RunLimiter)
+limiter = RunLimiter(_execute_run)
+
+@app.post("/graph/run", status_code=202, response_model=RunStartedResponse)
+async def run_graph(request: RunGraphRequest, background_tasks: BackgroundTasks, response: Response):
     """
-    Executes a workflow.
-    Blocks until completion (for simplicity) and returns the final state.
+    Starts a workflow and returns its run_id right away.
+    WHY: A workflow can take many (slow) steps; we don't want to hold the HTTP worker that long.
+    Poll /graph/state/{run_id} until 'status' is "completed" or "failed".
     """
     if request.graph_id not in graphs:
         # Check if it's the named example
@@ -76,34 +165,35 @@ async def run_graph(request: RunGraphRequest, background_tasks: BackgroundTasks)
     run_id = str(uuid.uuid4())
     graph = graphs[request.graph_id]
     
+    # WHY: Keys parsed from JSON are fresh strings. Interning them makes them the same
+    # objects as the keys in the tools' code, so dict lookups compare by pointer.
+    initial_state = {sys.intern(k): v for k, v in request.initial_state.items()}
+
     # Initialize run status
-    runs[run_id] = {"status": "running", "state": request.initial_state, "logs": []}
+    async with runs_lock:
+        runs[run_id] = {"status": "running", "state": initial_state, "logs": []}
 
-    try:
-        # Run the engine
-        result = await graph.run(request.initial_state, registry)
-        
-        runs[run_id]["status"] = "completed"
-        runs[run_id]["state"] = result["final_state"]
-        runs[run_id]["logs"] = result["logs"]
-        return {"run_id": run_id, "final_state": result["final_state"], "logs": result["logs"]}
-    except Exception as e:
-        runs[run_id]["status"] = "failed"
-        runs[run_id]["error"] = str(e)
-        raise HTTPException(status_code=500, detail=str(e))
+    # Run the engine after the response is sent (waits for a free slot if too many runs are active)
+    background_tasks.add_task(limiter.run, run_id, graph, initial_state, request.debug)
+
+    response.headers["Retry-After"] = "1" # Hint for how long to wait before the first poll
+    return {"run_id": run_id, "status": "running"}
 
-@app.get("/graph/state/{run_id}")
-def get_run_state(run_id: str):
+@app.get("/graph/state/{run_id}", response_model=RunStateResponse)
+async def get_run_state(run_id: str):
     """
     Retrieves the status and result of a specific run.
+    Runs older than RUNS_TTL_SECONDS are forgotten.
     """
-    if run_id not in runs:
+    async with runs_lock:
+        run = runs.get(run_id)
+    if run is None:
         raise HTTPException(status_code=404, detail="Run not found")
-    return runs[run_id]
+    return run
 
 @app.get("/tools")
 def list_tools():
-    return {"tools": registry.list_tools()}
+    return {"tools": registry.list_tools(), "conditions": registry.list_conditions()}
 
 @app.get("/")
 def read_root():
@@ -1,4 +1,4 @@
-from typing import Callable, Dict, Any
+from typing import Callable, Dict, Any, Tuple
 
 class ToolRegistry:
     """
@@ -11,12 +11,18 @@ class ToolRegistry:
     """
     def __init__(self):
         self._tools: Dict[str, Callable] = {}
+        # WHY: Graphs created via the API can only refer to conditions by name
+        # (we never eval code sent by a client), so conditions get their own phonebook.
+        self._conditions: Dict[str, Callable] = {}
+        # WHY: Bumped on every change, so graphs know when the tools they resolved are stale.
+        self.version = 0
 
     def register(self, name: str, func: Callable):
         """
         Registers a function so the graph engine can find it later.
         """
         self._tools[name] = func
+        self.version += 1
 
     def get_tool(self, name: str) -> Callable:
         """
@@ -30,6 +36,41 @@ class ToolRegistry:
         """Returns a list of all available tool names."""
         return list(self._tools.keys())
 
+    def register_condition(self, name: str, condition: Callable):
+        """
+        Registers a named edge condition (e.g. an IntThreshold) for use in API-defined graphs.
+        """
+        self._conditions[name] = condition
+
+    def get_condition(self, name: str) -> Callable:
+        """
+        Retrieves a condition using its string name.
+        """
+        if name not in self._conditions:
+            raise ValueError(f"Condition '{name}' not found.")
+        return self._conditions[name]
+
+    def list_conditions(self):
+        """Returns a list of all available condition names."""
+        return list(self._conditions.keys())
+
+def pure(reads: Tuple[str, ...]):
+    """
+    Marks a tool as a pure function of the given state keys:
+    same values for 'reads' -> same returned updates, and no changes to the state in place.
+
+    WHY: The engine can then cache the tool's result (see 'Graph._execute_tool'), so repeat
+    runs on the same input (common in tests and interactive dev) skip the recomputation.
+
+    Usage:
+        @pure(reads=("code",))
+        def check_complexity(state): ...
+    """
+    def decorator(func: Callable) -> Callable:
+        func.pure_reads = tuple(reads)
+        return func
+    return decorator
+
 # Global registry instance
 # We use a single global instance so all parts of the app share the same set of tools.
 registry = ToolRegistry()
@@ -36,12 +36,21 @@ def test_run_workflow():
     
     response = requests.post(f"{BASE_URL}/graph/run", json=payload)
     
-    if response.status_code == 200:
-        data = response.json()
+    if response.status_code != 202:
+        print(f"âŒ Error: {response.status_code}")
+        print(response.text)
+        return
+
+    run_id = response.json()["run_id"]
+    print(f"   Run ID: {run_id}")
+
+    # The run happens in the background, so poll its state until it is done
+    data = wait_for_run(run_id)
+    
+    if data["status"] == "completed":
         print("âœ… Workflow executed successfully!")
-        print(f"   Run ID: {data['run_id']}")
         
-        final_code = data["final_state"].get("code")
+        final_code = data["state"].get("code")
         print("\n--- Final Code ---")
         print(final_code)
         print("------------------")
@@ -51,10 +60,45 @@ def test_run_workflow():
         else:
             print("âŒ Failed: 'print' statement was NOT commented out.")
     else:
-        print(f"âŒ Error: {response.status_code}")
-        print(response.text)
+        print(f"âŒ Workflow {data['status']}: {data.get('error')}")
+
+def test_create_cyclic_graph():
+    """
+    Test that '/graph/create' rejects a loop that has no conditional way out.
+    WHY: Such a graph would spin until the step limit on every run.
+    """
+    print("\nTesting '/graph/create' with an unconditional cycle...")
+
+    payload = {
+        "name": "Loop",
+        "nodes": [
+            {"name": "a", "tool_name": "extract_functions"},
+            {"name": "b", "tool_name": "detect_issues"}
+        ],
+        "edges": [
+            {"source_node": "a", "target_node": "b"},
+            {"source_node": "b", "target_node": "a"}
+        ]
+    }
+
+    response = requests.post(f"{BASE_URL}/graph/create", json=payload)
+
+    if response.status_code == 400:
+        print(f"âœ… Cycle rejected: {response.json()['detail']}")
+    else:
+        print(f"âŒ Expected 400, got {response.status_code}")
+
+def wait_for_run(run_id, timeout=10):
+    """Polls '/graph/state/{run_id}' until the run is no longer running."""
+    deadline = time.time() + timeout
+    while True:
+        data = requests.get(f"{BASE_URL}/graph/state/{run_id}").json()
+        if data["status"] != "running" or time.time() > deadline:
+            return data
+        time.sleep(0.1)
 
 if __name__ == "__main__":
     # Ensure requests is installed: pip install requests
     if test_root():
         test_run_workflow()
+        test_create_cyclic_graph()
@@ -1,7 +1,10 @@
 import asyncio
-from app.registry import registry
-from app.engine import Graph, Node, Edge
-from app.workflows.code_review import create_code_review_graph
+import os
+from concurrent.futures import ProcessPoolExecutor
+from app.registry import registry, ToolRegistry
+from app.engine import Graph, Node, Edge, IntThreshold
+from app.workflows.code_review import CodeReviewState
+from app.workflows.code_review import create_code_review_graph, create_code_review_graph_fused
 
 async def test_code_review_workflow():
     """
@@ -34,5 +37,278 @@ async def test_code_review_workflow():
     assert "# print" in final_state["code"], "Fix should be applied (print commented out)"
     print("\nTest Passed! Logic is working.")
 
+async def test_fused_workflow_matches():
+    """
+    Verifies that the fused graph (one 'analyze_code' node) ends in the same state,
+    and that re-running a graph on the same input (cached 'pure' tools) gives the same result.
+    """
+    print("\nComparing fused and original Code Review Workflows...")
+    initial_state = {
+        "code": "def hello():\n    print('hello world')\n\ndef add(a, b):\n    return a + b",
+        "log": []
+    }
+    graph = create_code_review_graph()
+    fused_graph = create_code_review_graph_fused()
+
+    expected = (await graph.run(initial_state, registry))["final_state"]
+    rerun = (await graph.run(initial_state, registry))["final_state"]
+    fused = (await fused_graph.run(initial_state, registry))["final_state"]
+
+    assert rerun == expected, "Re-running on the same input should give the same result"
+    for key in ("code", "functions", "complexity", "issues", "issue_count", "quality_score"):
+        assert fused[key] == expected[key], f"Fused graph differs on '{key}'"
+    assert initial_state["log"] == [], "The caller's initial state should not be modified"
+
+    # Cached results must not be shared with the returned state
+    rerun["functions"].append("MUTATED")
+    again = (await graph.run(initial_state, registry))["final_state"]
+    assert again["functions"] == expected["functions"], "Editing a result should not change the cache"
+    print("Test Passed! Fused workflow matches.")
+
+async def test_dict_state_graph():
+    """
+    Verifies that the code review tools also work in a graph with a plain dict state
+    (like graphs created via '/graph/create'), and that the typed graph ignores extra keys.
+    """
+    print("\nRunning code review tools with a dict state...")
+    graph = Graph(name="DictState", start_node="extract")
+    graph.add_node(Node(name="extract", tool_name="extract_functions"))
+    graph.add_node(Node(name="detect", tool_name="detect_issues"))
+    graph.add_node(Node(name="suggest", tool_name="suggest_improvements"))
+    graph.add_edge(Edge(source_node="extract", target_node="detect"))
+    graph.add_edge(Edge(source_node="detect", target_node="suggest"))
+
+    result = await graph.run({"code": "def hello():\n    print('hi')"}, registry)
+    assert result["final_state"]["functions"] == ["hello"]
+    assert "# print" in result["final_state"]["code"]
+
+    result = await create_code_review_graph().run({"code": "x = 1", "author": "someone"}, registry)
+    assert result["final_state"]["issue_count"] == 0, "Extra initial state keys should be ignored"
+    print("Test Passed! Dict state works.")
+
+def test_int_threshold_compile():
+    """
+    Verifies that generated conditions behave like the plain check, including missing keys.
+    """
+    print("\nChecking compiled IntThreshold conditions...")
+    typed = CodeReviewState(code="")
+    typed.issue_count = 2
+    assert IntThreshold(key="issue_count", gt=1).compile(CodeReviewState)(typed) is True
+    assert IntThreshold(key="missing", gt=0).compile(CodeReviewState)(typed) is False, "Missing fields count as 0"
+    assert IntThreshold(key="class", gt=0).compile(CodeReviewState)(typed) is False
+    assert IntThreshold(key="class", gt=0).compile()({"class": 1}) is True, "Any dict key should work"
+    assert IntThreshold(key="issue count", gt=0).compile()({}) is False
+    try:
+        IntThreshold(key="score", gt=0.5)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("A non-int threshold would compile to a different check")
+    print("Test Passed! Compiled conditions work.")
+
+async def test_wave_fan_out():
+    """
+    Verifies that every unconditional successor of a node runs, and that 'batch_size'
+    caps how many nodes of a wave run at the same time.
+    """
+    print("\nRunning a fan-out graph in waves...")
+    tools = ToolRegistry()
+    running = {"now": 0, "max": 0}
+
+    def make_tool(name):
+        async def tool(state):
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            await asyncio.sleep(0.01)
+            running["now"] -= 1
+            return {name: True}
+        return tool
+
+    graph = Graph(name="FanOut", start_node="root", batch_size=2)
+    tools.register("root", make_tool("root"))
+    graph.add_node(Node(name="root", tool_name="root"))
+    for i in range(5):
+        tools.register(f"leaf{i}", make_tool(f"leaf{i}"))
+        graph.add_node(Node(name=f"leaf{i}", tool_name=f"leaf{i}"))
+        graph.add_edge(Edge(source_node="root", target_node=f"leaf{i}"))
+
+    result = await graph.run({}, tools)
+    assert all(result["final_state"].get(f"leaf{i}") for i in range(5)), "Every successor should run"
+    assert [log.node for log in result["logs"]] == ["root"] + [f"leaf{i}" for i in range(5)]
+    assert running["max"] == 2, f"At most batch_size nodes should run at once, saw {running['max']}"
+    print("Test Passed! Waves fan out.")
+
+def test_rejects_unconditional_cycle():
+    """
+    Verifies that a loop without a conditional edge (which could never end) is rejected at compile time,
+    while the same loop with a conditional way out is accepted.
+    """
+    print("\nChecking cycle detection...")
+    graph = Graph(name="Loop", start_node="a")
+    graph.add_node(Node(name="a", tool_name="extract_functions"))
+    graph.add_node(Node(name="b", tool_name="detect_issues"))
+    graph.add_edge(Edge(source_node="a", target_node="b"))
+    graph.add_edge(Edge(source_node="b", target_node="a"))
+    try:
+        graph.compile()
+    except ValueError as e:
+        assert "cycle" in str(e)
+    else:
+        raise AssertionError("An unconditional cycle should be rejected")
+
+    guarded = Graph(name="GuardedLoop", start_node="a")
+    guarded.add_node(Node(name="a", tool_name="extract_functions"))
+    guarded.add_node(Node(name="b", tool_name="detect_issues"))
+    guarded.add_edge(Edge(source_node="a", target_node="b"))
+    guarded.add_edge(Edge(source_node="b", target_node="a", condition=IntThreshold(key="issue_count", gt=0)))
+    guarded.compile()
+    print("Test Passed! Unconditional cycles are rejected.")
+
+async def test_condition_cache():
+    """
+    Verifies that a condition is only evaluated once per value of the keys it reads,
+    and always when the cache is disabled.
+    """
+    print("\nChecking the condition cache...")
+    tools = ToolRegistry()
+    tools.register("noop", lambda state: {})
+    calls = []
+
+    def flag_set(state):
+        calls.append(state["flag"])
+        return state["flag"] > 0
+
+    graph = Graph(name="Cached", start_node="a")
+    graph.add_node(Node(name="a", tool_name="noop"))
+    graph.add_node(Node(name="b", tool_name="noop"))
+    graph.add_edge(Edge(source_node="a", target_node="b", condition=flag_set, condition_reads=("flag",)))
+
+    for _ in range(3):
+        result = await graph.run({"flag": 1}, tools)
+        assert [log.node for log in result["logs"]] == ["a", "b"]
+    assert calls == [1], "Same read values should hit the cache"
+
+    await graph.run({"flag": 0}, tools)
+    assert calls == [1, 0], "New read values should be evaluated"
+
+    graph.disable_condition_cache()
+    await graph.run({"flag": 1}, tools)
+    await graph.run({"flag": 1}, tools)
+    assert calls == [1, 0, 1, 1], "A disabled cache should always evaluate"
+    print("Test Passed! Condition cache works.")
+
+def report_pid(state):
+    """A 'cpu_bound' tool (module-level, so worker processes can import it)."""
+    return {"pid": os.getpid()}
+report_pid.cpu_bound = True
+
+def edit_in_place(state):
+    """A 'cpu_bound' tool that wrongly edits the state instead of returning its updates."""
+    state["pid"] = os.getpid()
+edit_in_place.cpu_bound = True
+
+async def test_cpu_bound_tools():
+    """
+    Verifies that 'cpu_bound' tools run in the graph's executor (another process),
+    and that in-place edits, which would be lost there, are rejected.
+    """
+    print("\nRunning cpu_bound tools in a process pool...")
+    tools = ToolRegistry()
+    tools.register("report_pid", report_pid)
+    tools.register("edit_in_place", edit_in_place)
+
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        graph = Graph(name="Offload", start_node="work", executor=executor)
+        graph.add_node(Node(name="work", tool_name="report_pid"))
+        result = await graph.run({}, tools)
+        assert result["final_state"]["pid"] != os.getpid(), "cpu_bound tools should run in another process"
+
+        graph = Graph(name="OffloadInPlace", start_node="work", executor=executor)
+        graph.add_node(Node(name="work", tool_name="edit_in_place"))
+        try:
+            await graph.run({}, tools)
+        except ValueError as e:
+            assert "must return" in str(e)
+        else:
+            raise AssertionError("A cpu_bound tool that returns nothing should be rejected")
+    print("Test Passed! cpu_bound tools are offloaded.")
+
+async def test_debug_snapshots():
+    """
+    Verifies the execution log: one record per step, and in debug mode a snapshot of the state
+    as it was after that step (not a view of the live state).
+    """
+    print("\nChecking debug snapshots...")
+    initial_state = {"code": "def hello():\n    print('hi')", "log": []}
+    graph = create_code_review_graph()
+
+    result = await graph.run(initial_state, registry)
+    assert all(log.state_snapshot is None for log in result["logs"]), "Snapshots are only taken in debug mode"
+
+    result = await graph.run(initial_state, registry, debug=True)
+    logs = result["logs"]
+    assert [log.step for log in logs] == list(range(len(logs)))
+    assert all(log.error is None for log in logs)
+    assert [len(log.state_snapshot["log"]) for log in logs] == list(range(1, len(logs) + 1)), \
+        "Each snapshot should show the log as it was at that step"
+    assert logs[-1].state_snapshot["log"] is not result["final_state"]["log"]
+    assert logs[0].state_snapshot["functions"] == ["hello"]
+    print("Test Passed! Debug snapshots work.")
+
+def test_rejects_fan_out_in_step_mode():
+    """
+    Verifies that a graph with conditional edges (run step by step) may not fan out:
+    a node with two unconditional edges would silently skip one of them.
+    """
+    print("\nChecking fan-out in step-by-step graphs...")
+    graph = Graph(name="StepFanOut", start_node="a")
+    for name in ("a", "b", "c", "d"):
+        graph.add_node(Node(name=name, tool_name="extract_functions"))
+    graph.add_edge(Edge(source_node="a", target_node="b"))
+    graph.add_edge(Edge(source_node="a", target_node="c"))
+    graph.add_edge(Edge(source_node="c", target_node="d", condition=IntThreshold(key="issue_count", gt=0)))
+    try:
+        graph.compile()
+    except ValueError as e:
+        assert "more than one unconditional edge" in str(e)
+    else:
+        raise AssertionError("A step-by-step graph with fan-out should be rejected")
+    print("Test Passed! Step-by-step fan-out is rejected.")
+
+def test_compile_validation():
+    """
+    Verifies the structural checks of 'compile': empty graphs and edges to missing nodes
+    are rejected, and nodes that can't be reached from the start node are pruned.
+    """
+    print("\nChecking graph validation and dead node pruning...")
+    missing = Graph(name="Missing", start_node="a")
+    missing.add_node(Node(name="a", tool_name="extract_functions"))
+    missing.add_edge(Edge(source_node="a", target_node="ghost"))
+    for graph, message in ((Graph(name="Empty", start_node=""), "at least one node"), (missing, "'ghost' not found")):
+        try:
+            graph.compile()
+        except ValueError as e:
+            assert message in str(e), str(e)
+        else:
+            raise AssertionError(f"Graph '{graph.name}' should be rejected")
+
+    graph = Graph(name="Dead", start_node="a")
+    for name in ("a", "b", "dead"):
+        graph.add_node(Node(name=name, tool_name="extract_functions"))
+    graph.add_edge(Edge(source_node="a", target_node="b"))
+    graph.add_edge(Edge(source_node="dead", target_node="a"))
+    assert graph.compile() == [["a"], ["b"]], "Unreachable nodes should not be scheduled"
+    print("Test Passed! Graph validation works.")
+
 if __name__ == "__main__":
     asyncio.run(test_code_review_workflow())
+    asyncio.run(test_fused_workflow_matches())
+    asyncio.run(test_dict_state_graph())
+    test_int_threshold_compile()
+    asyncio.run(test_wave_fan_out())
+    test_rejects_unconditional_cycle()
+    asyncio.run(test_condition_cache())
+    asyncio.run(test_cpu_bound_tools())
+    asyncio.run(test_debug_snapshots())
+    test_rejects_fan_out_in_step_mode()
+    test_compile_validation()